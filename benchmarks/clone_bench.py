@@ -0,0 +1,40 @@
+"""clone_tree vs copy.deepcopy on wide and deep trees.
+
+Usage:
+    python benchmarks/clone_bench.py [repeats]
+"""
+import copy
+import sys
+import timeit
+
+from trict import clone_tree, recursive_set
+
+
+def wide_tree(width=1000, fields=10):
+    return {
+        f'doc{i}': {
+            'meta': {f'field{j}': f'value{j}' for j in range(fields)},
+            'count': i,
+        } for i in range(width)
+    }
+
+
+def deep_tree(depth=200, branches=20):
+    d = {}
+    for b in range(branches):
+        recursive_set(d, [f'branch{b}'] + ['level'] * depth, b)
+    return d
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    print(f'{"tree":>6} {"deepcopy ms":>12} {"clone_tree ms":>14} {"speedup":>8}')
+    for name, d in (('wide', wide_tree()), ('deep', deep_tree())):
+        assert clone_tree(d) == copy.deepcopy(d)
+        deep = min(timeit.repeat(lambda: copy.deepcopy(d), number=1, repeat=repeats))
+        clone = min(timeit.repeat(lambda: clone_tree(d), number=1, repeat=repeats))
+        print(f'{name:>6} {deep * 1000:>12.2f} {clone * 1000:>14.2f} {deep / clone:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Reader scaling of ConcurrentTrict vs a Trict behind one global lock.
+
+Each reader thread does a fixed number of lookups on hot paths while
+one writer keeps updating other paths. Prints total reads per second
+for each reader count.
+
+Usage:
+    python benchmarks/concurrent_bench.py [reads_per_thread]
+"""
+import sys
+import threading
+import time
+
+from trict import ConcurrentTrict, Trict, recursive_set
+
+HOT_PATHS = [f'payload.body.meta.field{i}' for i in range(20)]
+
+
+class LockedTrict:
+    """The usual workaround: one lock around every access."""
+
+    def __init__(self, tr):
+        self.tr = tr
+        self.lock = threading.Lock()
+
+    def __getitem__(self, key):
+        with self.lock:
+            return self.tr[key]
+
+    def __setitem__(self, key, val):
+        with self.lock:
+            self.tr[key] = val
+
+
+def make_data():
+    d = {}
+    for path in HOT_PATHS:
+        recursive_set(d, path.split('.'), 1)
+    return d
+
+
+def run(tr, n_readers, reads):
+    stop = threading.Event()
+    start = threading.Barrier(n_readers + 1)
+
+    def reader():
+        start.wait()
+        for i in range(reads):
+            tr[HOT_PATHS[i % len(HOT_PATHS)]]
+
+    def writer():
+        i = 0
+        while not stop.is_set():
+            tr[f'other.branch{i % 100}.value'] = i
+            i += 1
+
+    readers = [threading.Thread(target=reader) for _ in range(n_readers)]
+    w = threading.Thread(target=writer)
+    w.start()
+    for t in readers:
+        t.start()
+    start.wait()
+    t0 = time.perf_counter()
+    for t in readers:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    w.join()
+    return n_readers * reads / elapsed
+
+
+def main():
+    reads = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print(f'python {sys.version.split()[0]}, GIL {"on" if gil else "off"}')
+    print(f'{"readers":>8} {"locked reads/s":>16} {"concurrent reads/s":>20}')
+    for n in (1, 2, 4, 8):
+        locked = run(LockedTrict(Trict(make_data())), n, reads)
+        concurrent = run(ConcurrentTrict(make_data()), n, reads)
+        print(f'{n:>8} {locked:>16,.0f} {concurrent:>20,.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -21,6 +21,7 @@ setup(
   url = 'https://github.com/saska/trict',
   keywords = ['mapping', 'map', 'dictionary', 'recursive', 'dict'],
   install_requires=[],
+  extras_require={'numpy': ['numpy']},
   classifiers=[
     'Development Status :: 4 - Beta',
     'Intended Audience :: Developers',
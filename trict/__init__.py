@@ -1,3 +1,6 @@
 from trict.trict import Trict
-from trict.util import (flatten_dict, iter_keys, recursive_delete,
-                        recursive_set, traverse, leaves)
+from trict.concurrent import ConcurrentTrict
+from trict.shapes import ShapeCache
+from trict.util import (KeyPolicy, PathTable, clone_tree, flatten_dict,
+                        get_many, iter_keys, recursive_delete, recursive_set,
+                        traverse, leaves)
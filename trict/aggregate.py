@@ -0,0 +1,262 @@
+import hashlib
+import math
+from collections import UserDict
+
+from .util import PathTable, leaves
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_INT64_LIMIT = 2 ** 63
+
+
+class HyperLogLog:
+    """Cardinality sketch with fixed memory use.
+
+    Uses 2 ** precision one-byte registers, with a standard error of
+    about 1.04 / sqrt(2 ** precision). Values are hashed through their
+    repr with blake2b, which doesn't depend on the process for the
+    builtin types (str, bytes, int, float, bool, None and lists, tuples
+    and dicts of them), so sketches of those built in different
+    processes can be merged. Other objects only merge correctly if
+    their repr is the same in every process (the default repr has the
+    object's address in it, for example).
+
+    Args:
+        precision: int, between 4 and 16 (default 12, ~1.6% error in 4kB)
+    """
+
+    def __init__(self, precision=12):
+        if not 4 <= precision <= 16:
+            raise ValueError('precision must be between 4 and 16')
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value):
+        x = int.from_bytes(
+            hashlib.blake2b(repr(value).encode(), digest_size=8).digest(),
+            'big'
+        )
+        bits = 64 - self.precision
+        idx = x >> bits
+        rank = bits - (x & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError('Can only merge sketches with the same precision')
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def __len__(self):
+        m = len(self.registers)
+        if m >= 128:
+            alpha = 0.7213 / (1 + 1.079 / m)
+        else:
+            alpha = {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class _PathStats:
+    __slots__ = ('count', 'nulls', 'numeric', 'min', 'max', 'sum',
+                 'sketch', 'buffer')
+
+    def __init__(self, precision):
+        self.count = 0
+        self.nulls = 0
+        self.numeric = 0
+        self.min = None
+        self.max = None
+        self.sum = 0
+        self.sketch = HyperLogLog(precision)
+        self.buffer = []
+
+    def add_numbers(self, numbers):
+        self.numeric += len(numbers)
+        low, high, total = min(numbers), max(numbers), sum(numbers)
+        self._combine(low, high, total)
+
+    def flush(self):
+        if not self.buffer:
+            return
+        buffer, self.buffer = self.buffer, []
+        self.numeric += len(buffer)
+        # Ints and floats are reduced separately so min and max keep
+        # their type, same as without NumPy
+        ints = [v for v in buffer if type(v) is int]
+        floats = [v for v in buffer if type(v) is float]
+        if ints:
+            low, high = min(ints), max(ints)
+            if max(-low, high) * len(ints) < _INT64_LIMIT:
+                total = np.array(ints, dtype=np.int64).sum().item()
+            else:
+                # Could wrap around in int64, Python ints don't
+                total = sum(ints)
+            self._combine(low, high, total)
+        if floats:
+            arr = np.array(floats, dtype=np.float64)
+            self._combine(arr.min().item(), arr.max().item(), arr.sum().item())
+
+    def _combine(self, low, high, total):
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+        self.sum += total
+
+    def merge(self, other):
+        self.count += other.count
+        self.nulls += other.nulls
+        if other.numeric:
+            self.numeric += other.numeric
+            self._combine(other.min, other.max, other.sum)
+        self.sketch.merge(other.sketch)
+
+
+class LeafAggregator:
+    """Per-path statistics over the leaves of a stream of documents.
+
+    For each leaf path seen, keeps the count, number of None values,
+    min/max/sum of the numeric (int and float, not bool) values and
+    an approximate number of distinct values (see HyperLogLog).
+
+    Stats are kept per path like keys of a dict, so paths that are
+    equal but made of different key types (like (1,) and (True,))
+    are counted together, under the path first seen.
+
+    Sums of ints are exact. Sums of floats depend on the order they're
+    added in, so they can differ in the last bits between runs that
+    merge chunks differently or use NumPy (which sums pairwise).
+
+    Aggregators are picklable and can be combined with merge, so a
+    stream can be split into chunks that are aggregated in separate
+    processes (see HyperLogLog for which leaf types distinct counts
+    merge correctly for).
+
+    Args:
+        precision: int, HyperLogLog precision for distinct counts
+        use_numpy: bool, if True numeric values are buffered per path
+            and reduced with NumPy batch_size at a time. Needs numpy.
+        batch_size: int, see use_numpy
+        path_table: util.PathTable, used to intern key paths. A new
+            one is made if not given.
+
+    Example usage:
+        >>> agg = LeafAggregator()
+        >>> agg.update([{'user': {'age': 30}}, {'user': {'age': None}}])
+        >>> agg.results(sep='.')['user.age']
+        {
+            'count': 2, 'missing': 0, 'nulls': 1, 'null_rate': 0.5,
+            'min': 30, 'max': 30, 'sum': 30, 'distinct': 2
+        }
+    """
+
+    def __init__(self, precision=12, use_numpy=False, batch_size=1024,
+                 path_table=None):
+        if use_numpy and np is None:
+            raise ImportError('use_numpy=True needs numpy installed')
+        if not 4 <= precision <= 16:
+            raise ValueError('precision must be between 4 and 16')
+        self.precision = precision
+        self.use_numpy = use_numpy
+        self.batch_size = batch_size
+        self.path_table = PathTable() if path_table is None else path_table
+        self.documents = 0
+        self._stats = {}
+
+    def __getstate__(self):
+        self.flush()
+        state = self.__dict__.copy()
+        del state['path_table']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.path_table = PathTable()
+
+    def add(self, doc):
+        """Adds the leaves of one dict or Trict."""
+        if isinstance(doc, UserDict):
+            doc = doc.data
+        self.documents += 1
+        stats = self._stats
+        for path, v in leaves(doc, path_table=self.path_table):
+            s = stats.get(path)
+            if s is None:
+                s = stats[path] = _PathStats(self.precision)
+            s.count += 1
+            s.sketch.add(v)
+            if v is None:
+                s.nulls += 1
+            elif type(v) in (int, float):
+                if self.use_numpy:
+                    s.buffer.append(v)
+                    if len(s.buffer) >= self.batch_size:
+                        s.flush()
+                else:
+                    s.add_numbers((v,))
+
+    def update(self, docs):
+        """Adds the leaves of each dict or Trict in docs."""
+        for doc in docs:
+            self.add(doc)
+
+    def flush(self):
+        """Reduces numbers still buffered for NumPy."""
+        if self.use_numpy:
+            for s in self._stats.values():
+                s.flush()
+
+    def merge(self, other):
+        """Adds the statistics of another aggregator into this one."""
+        if other.precision != self.precision:
+            raise ValueError('Can only merge aggregators with the same precision')
+        self.flush()
+        other.flush()
+        self.documents += other.documents
+        for path, s in other._stats.items():
+            path = self.path_table.path(path)
+            if path in self._stats:
+                self._stats[path].merge(s)
+            else:
+                mine = self._stats[path] = _PathStats(self.precision)
+                mine.merge(s)
+        return self
+
+    def results(self, sep=None):
+        """Returns the statistics so far.
+
+        Args:
+            sep: str, if given, paths are joined with it, otherwise
+                they're tuples
+
+        returns:
+            {
+                path: {
+                    'count', 'missing', 'nulls', 'null_rate',
+                    'min', 'max', 'sum', 'distinct'
+                }
+            }
+            min, max and sum only cover numeric values, and min and max
+            are None if there weren't any.
+        """
+        self.flush()
+        ret = {}
+        for path, s in self._stats.items():
+            key = path if sep is None else self.path_table.join(path, sep)
+            ret[key] = {
+                'count': s.count,
+                'missing': self.documents - s.count,
+                'nulls': s.nulls,
+                'null_rate': s.nulls / s.count,
+                'min': s.min,
+                'max': s.max,
+                'sum': s.sum,
+                'distinct': len(s.sketch),
+            }
+        return ret
@@ -0,0 +1,214 @@
+import threading
+from contextlib import contextmanager
+
+from .trict import Trict
+from .util import _MISSING, clone_tree, iter_keys, leaves, traverse
+
+
+class ConcurrentTrict(Trict):
+    """Trict that can be shared between threads.
+
+    Reads don't take any locks. Writes lock the top-level key they
+    go under, with top-level keys spread over a fixed number of
+    striped locks, so writers to different branches don't block
+    each other. Missing branches are built before being attached
+    (see util.recursive_set), so readers never see half-set paths.
+    Whole-tree operations (flatten, flat_view, changes_since, snapshot,
+    traverse, leaves, iter_keys, map_leaves, map_with_dict, copying and
+    pickling) take all the locks.
+
+    Args:
+        initialdata, key_sep, path_table, key_policy, shape_cache: See Trict
+        stripes: int, number of write locks (default 16)
+    """
+
+    def __init__(self, initialdata, key_sep='.', stripes=16, **kwargs):
+        if stripes < 1:
+            raise ValueError('stripes must be at least 1')
+        self._make_locks(stripes)
+        super().__init__(initialdata, key_sep=key_sep, **kwargs)
+
+    def __copy__(self):
+        with self._all_locks():
+            inst = super().__copy__()
+        inst._make_locks(len(self._locks))
+        return inst
+
+    def copy(self):
+        # UserDict.copy empties self.data while copying
+        return self.__copy__()
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        del state['_locks'], state['_meta_lock']
+        state['data'] = self.snapshot()
+        state['_stripes'] = len(self._locks)
+        return state
+
+    def __setstate__(self, state):
+        self._make_locks(state.pop('_stripes'))
+        super().__setstate__(state)
+
+    def _make_locks(self, stripes):
+        self._locks = tuple(threading.RLock() for _ in range(stripes))
+        self._meta_lock = threading.Lock()
+
+    def _lock_for(self, key):
+        return self._locks[hash(key[0]) % len(self._locks)]
+
+    @contextmanager
+    def _all_locks(self):
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(self._locks):
+                lock.release()
+
+    @contextmanager
+    def _locks_for(self, keys):
+        # Always acquire in stripe order so writers can't deadlock
+        locks = [
+            self._locks[i] for i in
+            sorted({hash(k[0]) % len(self._locks) for k in keys})
+        ]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def _log_change(self, key, stale):
+        with self._meta_lock:
+            super()._log_change(key, stale)
+
+    def __setitem__(self, key, val):
+        key = self.key_to_seq(key)
+        with self._lock_for(key):
+            super().__setitem__(key, val)
+
+    def __delitem__(self, key):
+        key = self.key_to_seq(key)
+        with self._lock_for(key):
+            super().__delitem__(key)
+
+    def __contains__(self, key):
+        key = self.key_to_seq(key)
+        d = self.data
+        for k in key:
+            if not isinstance(d, dict):
+                return False
+            d = d.get(k, _MISSING)
+            if d is _MISSING:
+                return False
+        return len(key) > 0
+
+    def setdefault(self, key, default=None):
+        """Returns value at key, setting it to default first if not found."""
+        key = self.key_to_seq(key)
+        with self._lock_for(key):
+            try:
+                return self.__getitem__(key)
+            except KeyError:
+                self.__setitem__(key, default)
+                return default
+
+    def compare_and_set(self, key, expected, new):
+        """Sets key to new if its current value equals expected.
+
+        returns:
+            bool, True if the value was set. Missing keys never match,
+            use setdefault for those.
+        """
+        key = self.key_to_seq(key)
+        with self._lock_for(key):
+            try:
+                current = self.__getitem__(key)
+            except KeyError:
+                return False
+            if current != expected:
+                return False
+            self.__setitem__(key, new)
+            return True
+
+    def update_many(self, items):
+        """Sets many keys at once, without other writers in between.
+
+        Args:
+            items: dict or iterable of (key, value) pairs
+
+        Readers may still see some of the new values before others.
+        """
+        if hasattr(items, 'items'):
+            items = items.items()
+        items = [(self.key_to_seq(k), v) for k, v in items]
+        with self._locks_for([k for k, _ in items]):
+            for k, v in items:
+                super().__setitem__(k, v)
+
+    def snapshot(self):
+        """Returns a consistent copy of the data.
+
+        Only the nested dicts are copied, leaf values are shared.
+        """
+        with self._all_locks():
+            return clone_tree(self.data)
+
+    def clone(self, depth=None, copy_leaves=False):
+        """See Trict.clone"""
+        with self._all_locks():
+            inst = super().clone(depth=depth, copy_leaves=copy_leaves)
+        inst._make_locks(len(self._locks))
+        return inst
+
+    def traverse(self, *args, start=None, **kwargs):
+        """See util.traverse, runs over a snapshot"""
+        kwargs.setdefault('path_table', self.path_table)
+        if start is not None:
+            start = self.key_to_seq(start)
+        yield from traverse(self.snapshot(), *args, start=start, **kwargs)
+
+    def leaves(self, start=None, **kwargs):
+        """See util.leaves, runs over a snapshot"""
+        kwargs.setdefault('path_table', self.path_table)
+        if start is not None:
+            start = self.key_to_seq(start)
+        yield from leaves(self.snapshot(), start=start, **kwargs)
+
+    def iter_keys(self, start=None, **kwargs):
+        """See util.iter_keys, runs over a snapshot"""
+        if start is not None:
+            start = self.key_to_seq(start)
+        yield from iter_keys(self.snapshot(), start=start, **kwargs)
+
+    def flatten(self):
+        """See Trict.flatten"""
+        with self._all_locks():
+            return super().flatten()
+
+    def flat_view(self):
+        """See Trict.flat_view
+
+        The view isn't safe to iterate while other threads flatten,
+        use flatten for that.
+        """
+        with self._all_locks():
+            return super().flat_view()
+
+    def changes_since(self, token):
+        """See Trict.changes_since"""
+        with self._all_locks():
+            return super().changes_since(token)
+
+    def map_leaves(self, callable_):
+        """See Trict.map_leaves"""
+        with self._all_locks():
+            return super().map_leaves(callable_)
+
+    def map_with_dict(self, mapper_dict, strict=False):
+        """See Trict.map_with_dict"""
+        with self._all_locks():
+            return super().map_with_dict(mapper_dict, strict=strict)
@@ -0,0 +1,201 @@
+import threading
+from collections import OrderedDict
+from functools import reduce
+
+from .util import _MISSING
+
+_NOT_FOUND = object()
+_TRIAL = object()
+
+
+def _prefix_steps(paths):
+    """Steps to reach every proper prefix of paths from the root.
+
+    Returns a tuple of (index of parent prefix, key), where index 0
+    is the root and step i leads to prefix i + 1.
+    """
+    index = {(): 0}
+    steps = []
+    for path in paths:
+        for i in range(1, len(path)):
+            prefix = path[:i]
+            if prefix not in index:
+                index[prefix] = len(steps) + 1
+                steps.append((index[path[:i - 1]], path[i - 1]))
+    return tuple(steps)
+
+
+def _fingerprint(d, steps):
+    nodes = [d]
+    for parent, k in steps:
+        parent = nodes[parent]
+        nodes.append(
+            parent.get(k, _MISSING) if isinstance(parent, dict) else _MISSING
+        )
+    return tuple(
+        frozenset(node) if isinstance(node, dict)
+        else None if node is _MISSING
+        else True
+        for node in nodes
+    )
+
+
+def shape_fingerprint(d, paths):
+    """Hashable description of the parts of d that paths go through.
+
+    For the root and every dict along a prefix of a path in paths,
+    holds the set of its keys (None where a prefix is missing, True
+    where it's something other than a dict). Two dicts with the same
+    fingerprint resolve lookups of any of paths the same way, and the
+    rest of the document (and key order) doesn't matter.
+
+    Example usage:
+        >>> shape_fingerprint(
+                {'user': {'information': 1}, 'other': 2},
+                [['user', 'information'], ['user', 'name']]
+            )
+        (frozenset({'user', 'other'}), frozenset({'information'}))
+    """
+    return _fingerprint(d, _prefix_steps([tuple(p) for p in paths]))
+
+
+def _find(d, paths):
+    for path in paths:
+        node = d
+        for k in path:
+            if not isinstance(node, dict):
+                # Paths through lists etc. aren't covered by the fingerprint
+                return _TRIAL
+            node = node.get(k, _MISSING)
+            if node is _MISSING:
+                break
+        else:
+            return path
+    return _NOT_FOUND
+
+
+def _apply(d, step, paths):
+    if step is _NOT_FOUND:
+        return _MISSING
+    if step is _TRIAL:
+        for path in paths:
+            try:
+                return reduce(lambda x, y: x[y], path, d)
+            except KeyError:
+                continue
+        return _MISSING
+    return reduce(lambda x, y: x[y], step, d)
+
+
+def _freeze(paths):
+    return tuple(p if type(p) is str else tuple(p) for p in paths)
+
+
+class ShapeCache:
+    """Remembers which candidate paths exist per document shape.
+
+    Used by Trict.get_by_seq and Trict.map_with_dict when passed to
+    a Trict as shape_cache. The first document of a given shape (see
+    shape_fingerprint) is searched as usual and the winning path for
+    each output key is kept, so later documents of the same shape go
+    straight to the right path. Plans are kept per (mapper, shape) in
+    an LRU of maxsize entries. Mappers are matched by their contents,
+    so changing one in place is fine.
+
+    A ShapeCache can be shared between threads.
+
+    Args:
+        maxsize: int, max number of plans kept
+
+    Attributes:
+        hits: int, lookups answered from a cached plan
+        misses: int, lookups that needed a new plan
+    """
+
+    def __init__(self, maxsize=1024):
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._plans = OrderedDict()
+        self._compiled = {}
+        self._serial = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._plans)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+            self._compiled.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def resolve(self, d, mapper, key_sep='.'):
+        """Finds the value for each key of mapper in d.
+
+        Args:
+            d: dict, document to look in
+            mapper: dict, {key: [path, ...]} as in Trict.map_with_dict
+            key_sep: str, separator for string paths
+
+        returns:
+            {key: value}, with util._MISSING for keys with no path found
+        """
+        entry = self._compile(
+            (key_sep, tuple((k, _freeze(v)) for k, v in mapper.items()))
+        )
+        plan = self._plan(d, entry)
+        return {
+            k: _apply(d, step, paths)
+            for (k, paths), step in zip(entry[1], plan)
+        }
+
+    def resolve_seq(self, d, keys, key_sep='.'):
+        """Value of the first path in keys found in d, or util._MISSING."""
+        entry = self._compile((key_sep, ((None, _freeze(keys)),)))
+        plan = self._plan(d, entry)
+        return _apply(d, plan[0], entry[1][0][1])
+
+    def _compile(self, frozen):
+        entry = self._compiled.get(frozen)
+        if entry is not None:
+            return entry
+        key_sep, items = frozen
+        compiled = tuple(
+            (k, tuple(
+                tuple(p.split(key_sep)) if type(p) is str else p
+                for p in paths
+            )) for k, paths in items
+        )
+        steps = _prefix_steps([p for _, paths in compiled for p in paths])
+        with self._lock:
+            if len(self._compiled) >= self.maxsize:
+                self._compiled.clear()
+            self._serial += 1
+            entry = self._compiled[frozen] = (self._serial, compiled, steps)
+        return entry
+
+    def _plan(self, d, entry):
+        serial, compiled, steps = entry
+        key = (serial, _fingerprint(d, steps))
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self.hits += 1
+                self._plans.move_to_end(key)
+                return plan
+            self.misses += 1
+        plan = tuple(_find(d, paths) for _, paths in compiled)
+        with self._lock:
+            self._plans[key] = plan
+            if len(self._plans) > self.maxsize:
+                self._plans.popitem(last=False)
+        return plan
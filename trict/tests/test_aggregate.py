@@ -0,0 +1,103 @@
+import pickle
+import random
+
+import pytest
+
+from trict import Trict
+from trict.aggregate import HyperLogLog, LeafAggregator, np
+from trict.tests.helpers import base_dict
+
+
+def docs():
+    return [
+        {'user': {'age': 30, 'name': 'a'}},
+        {'user': {'age': None, 'name': 'b'}},
+        {'user': {'age': 50.5, 'name': 'a'}, 'extra': True},
+        Trict({'user': {'age': 10}}),
+    ]
+
+def test_hyperloglog_estimates():
+    sketch = HyperLogLog()
+    for i in range(10000):
+        sketch.add(i)
+        sketch.add(i)
+    assert abs(len(sketch) - 10000) < 500
+    assert len(HyperLogLog()) == 0
+    with pytest.raises(ValueError):
+        HyperLogLog(precision=3)
+
+def test_hyperloglog_merges():
+    a, b = HyperLogLog(), HyperLogLog()
+    for i in range(1000):
+        a.add(i)
+        b.add(i + 500)
+    assert abs(len(a.merge(b)) - 1500) < 100
+    with pytest.raises(ValueError):
+        a.merge(HyperLogLog(precision=10))
+
+def test_leaf_aggregator_aggregates():
+    agg = LeafAggregator()
+    agg.update(docs())
+    results = agg.results(sep='.')
+    assert results['user.age'] == {
+        'count': 4,
+        'missing': 0,
+        'nulls': 1,
+        'null_rate': 0.25,
+        'min': 10,
+        'max': 50.5,
+        'sum': 90.5,
+        'distinct': 4,
+    }
+    assert results['user.name']['missing'] == 1
+    assert results['user.name']['distinct'] == 2
+    assert results['user.name']['min'] is None
+    assert results['extra']['sum'] == 0
+    assert ('user', 'age') in agg.results()
+
+def test_leaf_aggregator_merges_pickled():
+    whole = LeafAggregator()
+    whole.update(docs() + [base_dict()])
+    first, second = LeafAggregator(), LeafAggregator()
+    first.update(docs()[:2])
+    second.update(docs()[2:] + [base_dict()])
+    second = pickle.loads(pickle.dumps(second))
+    assert first.merge(second).results() == whole.results()
+    with pytest.raises(ValueError):
+        first.merge(LeafAggregator(precision=10))
+
+@pytest.mark.skipif(np is None, reason='needs numpy')
+def test_leaf_aggregator_with_numpy():
+    agg = LeafAggregator(use_numpy=True, batch_size=2)
+    agg.update(docs())
+    plain = LeafAggregator()
+    plain.update(docs())
+    assert agg.results() == plain.results()
+
+@pytest.mark.skipif(np is None, reason='needs numpy')
+@pytest.mark.parametrize('values', [
+    [2 ** 62, 2 ** 62],
+    [2 ** 70, -2 ** 70, 3],
+    [1, 2.5, -3, 0.5],
+    [1.5, 2.5],
+    # Not exactly representable, NumPy's pairwise sum rounds differently
+    [random.Random(i).random() for i in range(1000)],
+])
+def test_leaf_aggregator_with_numpy_matches_plain(values):
+    numpy_agg = LeafAggregator(use_numpy=True, batch_size=len(values))
+    plain = LeafAggregator()
+    for v in values:
+        numpy_agg.add({'value': v})
+        plain.add({'value': v})
+    got = numpy_agg.results()[('value',)]
+    expected = plain.results()[('value',)]
+    assert got['sum'] == pytest.approx(expected['sum'], rel=1e-12)
+    got['sum'] = expected['sum']
+    assert got == expected
+    for stat in ('min', 'max', 'sum'):
+        assert type(got[stat]) is type(expected[stat])
+
+@pytest.mark.skipif(np is not None, reason='numpy installed')
+def test_leaf_aggregator_without_numpy_throws():
+    with pytest.raises(ImportError):
+        LeafAggregator(use_numpy=True)
@@ -0,0 +1,140 @@
+import copy
+import pickle
+import threading
+
+import pytest
+
+from trict import ConcurrentTrict
+from trict.tests.helpers import base_dict
+
+
+def test_concurrent_trict_acts_like_trict():
+    tr = ConcurrentTrict(base_dict())
+    assert tr['user.information.attribute'] == 'infonugget'
+    tr['user.superinformation.superattribute'] = 'super'
+    assert tr['user.superinformation.superattribute'] == 'super'
+    del tr['user.superinformation']
+    assert tr.data == base_dict()
+    assert 'user.information' in tr
+    assert ['user', 'information', 'attribute'] in tr
+    assert 'user.information.attribute.deeper' not in tr
+    assert 'user.nothing' not in tr
+    assert [] not in tr
+
+def test_concurrent_trict_init_throws():
+    with pytest.raises(ValueError):
+        ConcurrentTrict({}, stripes=0)
+
+def test_setdefault():
+    tr = ConcurrentTrict(base_dict())
+    assert tr.setdefault('user.information.attribute', 'other') == 'infonugget'
+    assert tr.setdefault('user.newinformation.attribute', 'new') == 'new'
+    assert tr['user.newinformation.attribute'] == 'new'
+
+def test_compare_and_set():
+    tr = ConcurrentTrict(base_dict())
+    assert not tr.compare_and_set('user.moreinformation', 'wrong', 'new')
+    assert tr['user.moreinformation'] == 'extranugget'
+    assert tr.compare_and_set('user.moreinformation', 'extranugget', 'new')
+    assert tr['user.moreinformation'] == 'new'
+    assert not tr.compare_and_set('user.nothing', None, 'new')
+    assert 'user.nothing' not in tr
+
+def test_update_many():
+    tr = ConcurrentTrict(base_dict())
+    tr.update_many({
+        'user.moreinformation': 'new',
+        'other.information': 'other',
+    })
+    tr.update_many([(['third', 'information'], 'third')])
+    assert tr['user.moreinformation'] == 'new'
+    assert tr['other.information'] == 'other'
+    assert tr['third.information'] == 'third'
+
+def test_snapshot_is_a_copy():
+    tr = ConcurrentTrict(base_dict())
+    snap = tr.snapshot()
+    assert snap == tr.data
+    tr['user.information.attribute'] = 'changed'
+    assert snap['user']['information']['attribute'] == 'infonugget'
+    assert list(tr.traverse(keys_only=True))[0] == ['user']
+
+def test_copy_has_own_locks():
+    tr = ConcurrentTrict(base_dict())
+    other = copy.copy(tr)
+    assert other._locks is not tr._locks
+    other['other'] = 'other'
+    assert 'other' not in tr
+
+def test_clone_has_own_locks():
+    tr = ConcurrentTrict(base_dict())
+    cl = tr.clone()
+    assert type(cl) is ConcurrentTrict
+    assert cl._locks is not tr._locks
+    cl['user.moreinformation'] = 'other'
+    assert tr['user.moreinformation'] == 'extranugget'
+
+def test_concurrent_counters():
+    tr = ConcurrentTrict({})
+    tr.flatten()
+
+    def work(i):
+        for _ in range(200):
+            while True:
+                current = tr.setdefault('counters.shared', 0)
+                if tr.compare_and_set('counters.shared', current, current + 1):
+                    break
+            tr[f'workers.{i}.seen'] = tr.get_many(['counters.shared'])[0]
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert tr['counters.shared'] == 1600
+    assert len(tr['workers']) == 8
+    assert tr.flatten()['counters.shared'] == 1600
+
+def test_concurrent_copy_and_pickle():
+    tr = ConcurrentTrict(base_dict(), stripes=4)
+    tr.flatten()
+    copies = [
+        tr.copy(), copy.copy(tr), copy.deepcopy(tr),
+        pickle.loads(pickle.dumps(tr)),
+    ]
+    for other in copies:
+        assert type(other) is ConcurrentTrict
+        assert other.data == tr.data
+        assert len(other._locks) == 4
+        assert other._locks[0] is not tr._locks[0]
+        other['extra'] = 1
+        assert other.flatten()['extra'] == 1
+    assert 'extra' not in tr
+
+def test_concurrent_readers_during_copy_and_flatten():
+    tr = ConcurrentTrict({f'k{i}': {'v': i} for i in range(50)})
+    stop = threading.Event()
+    errors = []
+
+    def read():
+        try:
+            while not stop.is_set():
+                assert 'k1.v' in tr
+                for _ in tr.flatten():
+                    pass
+        except Exception as e: # pylint: disable=broad-except
+            errors.append(e)
+
+    def write():
+        for i in range(500):
+            tr[f'new{i % 20}'] = i
+            tr.copy()
+            tr.flatten()
+        stop.set()
+
+    threads = [threading.Thread(target=read), threading.Thread(target=write)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
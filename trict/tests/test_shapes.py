@@ -0,0 +1,132 @@
+import threading
+
+import pytest
+
+from trict import ShapeCache, Trict
+from trict.shapes import shape_fingerprint
+from trict.tests.helpers import base_dict
+
+
+MAPPER = {
+    'newkey': [
+        'user.noninformation.nonattribute',
+        'user.information.another_attribute'
+    ],
+    'othernewkey': [
+        ['user', 'noninformation'],
+        ['user', 'information']
+    ],
+    'missingkey': [
+        'none.of.these'
+    ]
+}
+
+def test_shape_fingerprint():
+    paths = [['user', 'information', 'attribute'], ['user', 'nothing', 'here']]
+    assert shape_fingerprint(base_dict(), paths) == (
+        frozenset({'user'}),
+        frozenset({'information', 'moreinformation'}),
+        frozenset({'attribute', 'another_attribute'}),
+        None,
+    )
+    assert shape_fingerprint({'user': {'information': 1}}, paths) == (
+        frozenset({'user'}),
+        frozenset({'information'}),
+        True,
+        None,
+    )
+    assert shape_fingerprint({'a': 1, 'b': 2}, [['a']]) == \
+        shape_fingerprint({'b': 2, 'a': 1}, [['a']])
+    wide = dict(base_dict(), other={str(i): {} for i in range(50)})
+    assert shape_fingerprint(wide, [['other', 'x']]) != \
+        shape_fingerprint(base_dict(), [['other', 'x']])
+    assert shape_fingerprint(wide, [['user', 'information', 'attribute']])[1:] == \
+        shape_fingerprint(base_dict(), [['user', 'information', 'attribute']])[1:]
+
+def test_map_with_dict_with_shape_cache():
+    cache = ShapeCache()
+    expected = Trict(base_dict()).map_with_dict(MAPPER).data
+    for _ in range(3):
+        tr = Trict(base_dict(), shape_cache=cache)
+        assert tr.map_with_dict(MAPPER).data == expected
+    assert (cache.hits, cache.misses) == (2, 1)
+    assert cache.hit_rate == 2 / 3
+    other = {'user': {'noninformation': {'nonattribute': 'other'}}}
+    assert Trict(other, shape_cache=cache).map_with_dict(MAPPER).data == {
+        'newkey': 'other',
+        'othernewkey': {'nonattribute': 'other'},
+        'missingkey': None,
+    }
+    assert cache.misses == 2
+    with pytest.raises(KeyError):
+        Trict(base_dict(), shape_cache=cache).map_with_dict(MAPPER, strict=True)
+
+def test_get_by_seq_with_shape_cache():
+    cache = ShapeCache()
+    for _ in range(2):
+        tr = Trict(base_dict(), shape_cache=cache)
+        assert tr.get_by_seq([
+            'user.misinformation.attribute',
+            ['user', 'information', 'attribute']
+        ]) == 'infonugget'
+        assert tr.get_by_seq(['none.of.these']) is None
+        with pytest.raises(KeyError):
+            tr.get_by_seq(['none.of.these'], strict=True)
+    assert (cache.hits, cache.misses) == (4, 2)
+
+def test_shape_cache_paths_through_lists():
+    cache = ShapeCache()
+    keys = [['items', 0, 'title'], ['items', 0, 'name']]
+    tr = Trict({'items': [{'name': 'name'}]}, shape_cache=cache)
+    assert tr.get_by_seq(keys) == 'name'
+    tr = Trict({'items': [{'title': 'title'}]}, shape_cache=cache)
+    assert tr.get_by_seq(keys) == 'title'
+    assert cache.hits == 1
+
+def test_shape_cache_evicts():
+    cache = ShapeCache(maxsize=2)
+    for d in [{'a': 1}, {'b': 1}, {'c': 1}, {'a': 1}]:
+        Trict(d, shape_cache=cache).get_by_seq(['a'])
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (0, 4)
+    cache.clear()
+    assert len(cache) == 0 and cache.hit_rate == 0.0
+    with pytest.raises(ValueError):
+        ShapeCache(maxsize=0)
+
+def test_shape_cache_ignores_key_order():
+    cache = ShapeCache()
+    Trict({'a': 1, 'b': 2}, shape_cache=cache).get_by_seq(['b'])
+    Trict({'b': 2, 'a': 1}, shape_cache=cache).get_by_seq(['b'])
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_shape_cache_sees_mapper_changes():
+    cache = ShapeCache()
+    mapper = {'name': ['user.name']}
+    Trict({'user': {'name': 'a'}}, shape_cache=cache).map_with_dict(mapper)
+    mapper['name'].append('n')
+    mapper['extra'] = ['n']
+    assert Trict({'n': 'b'}, shape_cache=cache).map_with_dict(mapper).data == {
+        'name': 'b',
+        'extra': 'b',
+    }
+
+def test_shape_cache_shared_between_threads():
+    cache = ShapeCache(maxsize=2)
+    errors = []
+
+    def work(i):
+        try:
+            for j in range(300):
+                tr = Trict({f'k{(i + j) % 5}': j}, shape_cache=cache)
+                assert tr.get_by_seq([f'k{(i + j) % 5}']) == j
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert cache.hits + cache.misses == 2400
@@ -1,8 +1,9 @@
 import copy
+import pickle
 
 import pytest
 
-from trict import Trict
+from trict import KeyPolicy, PathTable, Trict, flatten_dict
 from trict.tests.helpers import base_dict, invalid_base_dict
 
 
@@ -175,6 +176,17 @@ def test_nonstrict_get_by_seq_not_throws():
         ])
     assert val == None 
 
+def test_get_many_gets():
+    tr = Trict(base_dict())
+    old_data = copy.deepcopy(tr.data)
+    assert tr.get_many([
+        'user.information.attribute',
+        ['user', 'information', 'another_attribute'],
+        'user.misinformation.attribute',
+    ]) == ['infonugget', 'secondnugget', None]
+    assert tr.get_many(['nothing.here'], default='default') == ['default']
+    assert tr.data == old_data
+
 def test_flatten_flats():
     tr = Trict(base_dict())
     old_data = copy.deepcopy(tr.data)
@@ -185,6 +197,97 @@ def test_flatten_flats():
     }
     assert tr.data == old_data
 
+def test_flatten_after_changes_flats():
+    tr = Trict(base_dict())
+    tr.flatten()
+    tr['user.information.attribute'] = 'differentnugget'
+    tr['user.newinformation'] = {'newattribute': 'new'}
+    del tr['user.moreinformation']
+    tr['user.temporary'] = 'temp'
+    del tr['user.temporary']
+    assert tr.flatten() == flatten_dict(tr.data)
+    tr.map_leaves(lambda x: x + '!')
+    assert tr.flatten() == flatten_dict(tr.data)
+    del tr['user.information']
+    assert tr.flatten() == flatten_dict(tr.data)
+    tr.map_with_dict({'newkey': ['user.newinformation.newattribute']})
+    assert tr.flatten() == {'newkey': 'new!'}
+
+def test_flatten_result_not_shared():
+    tr = Trict(base_dict())
+    flat = tr.flatten()
+    flat['user.moreinformation'] = 'changed'
+    assert tr.flatten()['user.moreinformation'] == 'extranugget'
+    tr['user.moreinformation'] = 'v2'
+    assert flat['user.moreinformation'] == 'changed'
+    assert tr.flatten() is not tr.flatten()
+
+def test_flat_view_read_only():
+    tr = Trict(base_dict())
+    view = tr.flat_view()
+    assert view == tr.flatten()
+    with pytest.raises(TypeError):
+        view['user.moreinformation'] = 'changed'
+    tr['user.moreinformation'] = 'changed'
+    tr.flat_view()
+    assert view['user.moreinformation'] == 'changed'
+
+def test_deepcopy_and_pickle_after_flatten():
+    tr = Trict(base_dict())
+    tr.flatten()
+    tr['user.moreinformation'] = 'changed'
+    for other in (copy.deepcopy(tr), pickle.loads(pickle.dumps(tr))):
+        assert other.data == tr.data
+        assert other.data is not tr.data
+        assert other.flatten() == tr.flatten()
+        other['user.moreinformation'] = 'other'
+        assert other.flatten()['user.moreinformation'] == 'other'
+        assert tr.flatten()['user.moreinformation'] == 'changed'
+
+def test_changes_since():
+    tr = Trict(base_dict())
+    token = tr.change_token
+    assert tr.changes_since(token) == ({}, set())
+    tr['user.information'] = 'flattened'
+    tr['user.newinformation.newattribute'] = 'new'
+    changed, removed = tr.changes_since(token)
+    assert changed == {
+        'user.information': 'flattened',
+        'user.newinformation.newattribute': 'new',
+    }
+    assert removed == {
+        'user.information.attribute',
+        'user.information.another_attribute',
+    }
+    token = tr.change_token
+    del tr['user.newinformation']
+    assert tr.changes_since(token) == (
+        {}, {'user.newinformation.newattribute'}
+    )
+
+def test_changes_since_throws_on_old_token():
+    tr = Trict(base_dict())
+    tr.change_log_size = 2
+    with pytest.raises(ValueError):
+        tr.changes_since(0)
+    token = tr.change_token
+    tr['a'] = 1
+    tr['b'] = 2
+    tr.changes_since(token)
+    tr['c'] = 3
+    with pytest.raises(ValueError):
+        tr.changes_since(token)
+    with pytest.raises(ValueError):
+        tr.changes_since(tr.change_token + 1)
+    assert tr.flatten() == flatten_dict(tr.data)
+
+def test_copy_does_not_share_changes():
+    tr = Trict(base_dict())
+    token = tr.change_token
+    other = copy.copy(tr)
+    other['user.moreinformation'] = 'other'
+    assert tr.changes_since(token) == ({}, set())
+
 def test_traverse_traverses():
     tr = Trict(base_dict())
     old_data = copy.deepcopy(tr.data)
@@ -230,6 +333,19 @@ def test_leaves():
     ]
     assert tr.data == old_data
 
+def test_traverse_and_leaves_with_options():
+    tr = Trict(base_dict())
+    assert [k for k in tr.traverse(keys_only=True, start='user', max_depth=1)] == [
+        ['user', 'information'],
+        ['user', 'moreinformation'],
+    ]
+    assert [l for l in tr.leaves(start='user.information', limit=1)] == [
+        (['user', 'information', 'attribute'], 'infonugget')
+    ]
+    assert [k for k in tr.iter_keys(start=['user'], max_depth=1)] == [
+        'information', 'moreinformation'
+    ]
+
 def test_map_leaves_maps():
     tr = Trict(base_dict())
     tr.map_leaves(lambda x: x + ' and something more')
@@ -316,5 +432,60 @@ def test_from_flat_dict_with_nested_dict_inits():
         'otherinfo': 'secondnugget'
     }
 
+def test_path_table_shared_between_tricts():
+    table = PathTable()
+    tr = Trict(base_dict(), path_table=table)
+    other = Trict.from_flat_dict(tr.flatten(), path_table=table)
+    assert other.data == tr.data
+    assert other.path_table is table
+    assert list(other.flatten()) == list(tr.flatten())
+    for k1, k2 in zip(tr.flatten(), other.flatten()):
+        assert k1 is k2
+    assert [k for k, _ in tr.leaves()][0] == ('user', 'information', 'attribute')
+    assert 'user.information' in tr
+    assert ['user', 'information'] in tr
+
+def test_clone_clones():
+    tr = Trict(base_dict(), key_sep='/')
+    tr.flatten()
+    cl = tr.clone()
+    assert type(cl) is Trict
+    assert cl.data == tr.data
+    assert cl.key_sep == '/'
+    assert cl.data is not tr.data
+    assert cl.flatten() == tr.flatten()
+    cl['user/information/attribute'] = 'changed'
+    assert tr['user/information/attribute'] == 'infonugget'
+    assert tr.changes_since(tr.change_token) == ({}, set())
+    assert tr.clone(depth=1)['user'] is tr['user']
+    with pytest.raises(ValueError):
+        tr.clone(depth=0)
+
+def test_key_policy_checks_on_init():
+    policy = KeyPolicy(pattern=r'[a-z_]+', max_depth=3)
+    Trict(base_dict(), key_policy=policy)
+    with pytest.raises(ValueError, match='key_sep found in key attr.ibute'):
+        Trict(invalid_base_dict(), key_policy=KeyPolicy())
+    with pytest.raises(ValueError, match='deeper than 2'):
+        Trict(base_dict(), key_policy=KeyPolicy(max_depth=2))
+    with pytest.raises(ValueError, match="doesn't match pattern"):
+        Trict.from_flat_dict({'user.Information': 1}, key_policy=policy)
+
+def test_key_policy_checks_on_write():
+    tr = Trict(base_dict(), key_policy=KeyPolicy(pattern=r'[a-z_]+', max_depth=3))
+    tr['user.newinformation'] = {'attribute': 'new'}
+    with pytest.raises(ValueError, match="doesn't match pattern"):
+        tr['user.Information'] = 'new'
+    with pytest.raises(ValueError, match='deeper than 3'):
+        tr['user.information'] = {'attribute': {'deeper': 'new'}}
+    with pytest.raises(ValueError, match="doesn't match pattern"):
+        tr.map_with_dict({'NewKey': ['user.information']})
+    assert tr.map_with_dict({'newkey': ['user.information']}) == {
+        'newkey': {
+            'attribute': 'infonugget',
+            'another_attribute': 'secondnugget'
+        }
+    }
+
 def test_repr():
     assert Trict({}).__repr__() == 'Trict({})'
\ No newline at end of file
@@ -1,10 +1,13 @@
 import copy
+import sys
+from collections import defaultdict
 
 import pytest
 
 from trict.tests.helpers import base_dict, invalid_base_dict
-from trict.util import (flatten_dict, iter_keys, leaves, recursive_delete,
-                        recursive_set, traverse)
+from trict.util import (KeyPolicy, PathTable, clone_tree, flatten_dict, get_many,
+                        iter_keys, leaves, recursive_delete, recursive_set,
+                        traverse)
 
 
 def test_recursive_set_sets():
@@ -138,3 +141,222 @@ def test_iter_keys():
         'another_attribute', 
         'moreinformation'
     ]
+
+def test_get_many_gets():
+    d = base_dict()
+    old_d = copy.deepcopy(d)
+    assert get_many(d, [
+        ['user', 'information', 'attribute'],
+        ['user', 'information', 'notanattribute'],
+        ['user', 'moreinformation', 'deeper'],
+        ['user', 'information', 'attribute'],
+        ['user', 'moreinformation'],
+        [],
+    ], default='missing') == [
+        'infonugget',
+        'missing',
+        'missing',
+        'infonugget',
+        'extranugget',
+        d,
+    ]
+    assert d == old_d
+
+def test_path_table_interns():
+    table = PathTable()
+    assert table.path(['user', 'information']) is table.path(('user', 'information'))
+    assert table.path(['user']) == ('user',)
+    key = table.join(['user', 'information'], '.')
+    assert key == 'user.information'
+    assert table.join(('user', 'information'), '.') is key
+    assert table.join(('user', 'information'), '/') == 'user/information'
+    assert table.split('user.information', '.') is table.path(['user', 'information'])
+
+def test_path_table_evicts():
+    table = PathTable(maxsize=2)
+    a = table.path(['a'])
+    table.path(['b'])
+    assert table.path(('a',)) is a
+    table.path(['c'])
+    assert len(table) == 2
+    assert table.path(('a',)) is a
+    with pytest.raises(ValueError):
+        PathTable(maxsize=0)
+
+def test_path_table_join_throws():
+    table = PathTable()
+    with pytest.raises(ValueError):
+        table.join(['attr.ibute'], '.', check_keys=True)
+    assert len(table) == 1
+
+def test_path_table_keeps_key_types():
+    table = PathTable()
+    assert [l for l in leaves({1: 'x'}, path_table=table)] == [((1,), 'x')]
+    [(path, _)] = leaves({True: 'y'}, path_table=table)
+    assert type(path[0]) is bool
+    [_, (path, _)] = traverse({'a': {1.0: 'z'}}, path_table=table)
+    assert type(path[1]) is float
+    [(path, _)] = leaves({1: {'a': 'x'}}, path_table=table)
+    assert type(path[0]) is int
+    [(path, _)] = leaves({True: {'a': 'y'}}, path_table=table)
+    assert type(path[0]) is bool
+    assert type(table.path([True, 'a'])[0]) is bool
+
+def test_flatten_dict_with_path_table_flattens():
+    table = PathTable()
+    d = base_dict()
+    first = flatten_dict(d, path_table=table)
+    second = flatten_dict(base_dict(), path_table=table)
+    assert first == flatten_dict(d)
+    for k1, k2 in zip(first, second):
+        assert k1 is k2
+    with pytest.raises(ValueError):
+        flatten_dict(invalid_base_dict(), path_table=table)
+
+def test_leaves_and_traverse_with_path_table():
+    table = PathTable()
+    d = base_dict()
+    assert [l for l in leaves(d, path_table=table)] == [
+        (tuple(k), v) for k, v in leaves(d)
+    ]
+    assert [k for k in traverse(d, keys_only=True, path_table=table)] == [
+        tuple(k) for k in traverse(d, keys_only=True)
+    ]
+    for (k1, _), (k2, _) in zip(leaves(d, path_table=table),
+                                leaves(base_dict(), path_table=table)):
+        assert k1 is k2
+
+def test_traverse_with_options():
+    d = base_dict()
+    assert [k for k in traverse(d, keys_only=True, max_depth=2)] == [
+        ['user'],
+        ['user', 'information'],
+        ['user', 'moreinformation'],
+    ]
+    assert [k for k in traverse(d, keys_only=True, start=['user', 'information'])] == [
+        ['user', 'information', 'attribute'],
+        ['user', 'information', 'another_attribute'],
+    ]
+    assert [k for k in traverse(d, keys_only=True, limit=2)] == [
+        ['user'],
+        ['user', 'information'],
+    ]
+    seen = []
+    def prune(path, value):
+        seen.append(path)
+        return path[-1] == 'information'
+    assert [k for k in traverse(d, keys_only=True, prune=prune)] == [
+        ['user'],
+        ['user', 'moreinformation'],
+    ]
+    assert ['user', 'information', 'attribute'] not in seen
+    assert [k for k in traverse(d, max_depth=0)] == []
+    with pytest.raises(KeyError):
+        list(traverse(d, start=['user', 'nothing']))
+
+def test_leaves_with_options():
+    d = base_dict()
+    assert [l for l in leaves(d, max_depth=2)] == [
+        (['user', 'moreinformation'], 'extranugget')
+    ]
+    assert [l for l in leaves(d, start=['user', 'information'], limit=1)] == [
+        (['user', 'information', 'attribute'], 'infonugget')
+    ]
+    assert [l for l in leaves(d, prune=lambda p, v: v == 'infonugget')] == [
+        (['user', 'information', 'another_attribute'], 'secondnugget'),
+        (['user', 'moreinformation'], 'extranugget')
+    ]
+    assert [l for l in leaves(d, start=['user', 'moreinformation'])] == []
+
+def test_iter_keys_with_options():
+    d = base_dict()
+    assert [k for k in iter_keys(d, max_depth=2)] == [
+        'user', 'information', 'moreinformation'
+    ]
+    assert [k for k in iter_keys(d, start=['user'], limit=2)] == [
+        'information', 'attribute'
+    ]
+    assert [k for k in iter_keys(d, prune=lambda p, v: len(p) > 2)] == [
+        'user', 'information', 'moreinformation'
+    ]
+
+def test_traverse_deep_dict():
+    d = {}
+    recursive_set(d, ['k'] * (sys.getrecursionlimit() * 2), 'deep')
+    assert len([k for k in iter_keys(d)]) == sys.getrecursionlimit() * 2
+    assert [k for k in iter_keys(d, limit=3)] == ['k', 'k', 'k']
+
+def test_clone_tree_clones():
+    d = base_dict()
+    d['user']['list'] = [1, 2]
+    c = clone_tree(d)
+    assert c == d
+    assert c['user'] is not d['user']
+    assert c['user']['information'] is not d['user']['information']
+    assert c['user']['list'] is d['user']['list']
+    c['user']['information']['attribute'] = 'changed'
+    assert d['user']['information']['attribute'] == 'infonugget'
+
+def test_clone_tree_with_depth():
+    d = base_dict()
+    c = clone_tree(d, depth=1)
+    assert c == d
+    assert c is not d
+    assert c['user'] is d['user']
+    c = clone_tree(d, depth=2)
+    assert c['user'] is not d['user']
+    assert c['user']['information'] is d['user']['information']
+    with pytest.raises(ValueError):
+        clone_tree(d, depth=0)
+
+def test_clone_tree_keeps_dict_subclasses():
+    counts = defaultdict(int, {'a': 1})
+    d = {'user': {'counts': counts}}
+    c = clone_tree(d)
+    assert c['user']['counts'] is counts
+    c = clone_tree(d, copy_leaves=True)
+    assert type(c['user']['counts']) is defaultdict
+    assert c['user']['counts'] is not counts
+    assert c['user']['counts']['missing'] == 0
+
+def test_clone_tree_copies_leaves():
+    shared = [1, 2]
+    d = {'a': {'list': shared}, 'b': shared}
+    c = clone_tree(d, copy_leaves=True)
+    assert c == d
+    assert c['a']['list'] is not shared
+    assert c['a']['list'] is c['b']
+
+def test_clone_tree_deep_dict():
+    d = {}
+    recursive_set(d, ['k'] * (sys.getrecursionlimit() * 2), 'deep')
+    c = clone_tree(d)
+    assert [l for l in leaves(c)] == [l for l in leaves(d)]
+
+def test_key_policy_checks_keys():
+    policy = KeyPolicy(pattern=r'[a-z_]+', max_key_length=12)
+    policy.check_key('information')
+    with pytest.raises(ValueError, match="doesn't match pattern"):
+        policy.check_key('Information')
+    with pytest.raises(ValueError, match='longer than 12'):
+        policy.check_key('moreinformation')
+    with pytest.raises(ValueError, match='not a string'):
+        policy.check_key(1)
+    policy = KeyPolicy(allowed_chars='abc')
+    policy.check_key('abba')
+    with pytest.raises(ValueError, match="aren't allowed"):
+        policy.check_key('abcd')
+    KeyPolicy(max_depth=1).check_key(1)
+
+def test_key_policy_checks_paths_and_trees():
+    policy = KeyPolicy(pattern=r'[a-z_]+', max_depth=3)
+    policy.check_path(['user', 'information', 'attribute'])
+    policy.check_tree(base_dict())
+    with pytest.raises(ValueError, match='deeper than 3'):
+        policy.check_path(['user', 'information', 'attribute', 'deeper'])
+    with pytest.raises(ValueError, match='deeper than 3'):
+        policy.check_tree(base_dict(), depth=1)
+    with pytest.raises(ValueError, match='key_sep found in key attr.ibute'):
+        KeyPolicy().check_tree(invalid_base_dict(), key_sep='.')
+    with pytest.raises(ValueError, match="doesn't match pattern"):
+        policy.check_tree(invalid_base_dict())
@@ -1,9 +1,11 @@
 import sys
-from collections import UserDict
+from collections import UserDict, deque
 from functools import reduce
+from itertools import islice
+from types import MappingProxyType
 
-from .util import (flatten_dict, iter_keys, recursive_delete, recursive_set,
-                  leaves, traverse)
+from .util import (_MISSING, clone_tree, flatten_dict, get_many, iter_keys,
+                   recursive_delete, recursive_set, leaves, traverse)
 
 
 class Trict(UserDict):
@@ -13,6 +15,22 @@ class Trict(UserDict):
         initialdata: dict
         key_sep: str, used to separate keys when key lists
             want to be made into single strings
+        path_table: util.PathTable, optional. If given, flatten,
+            leaves, traverse and from_flat_dict share key paths
+            and flat keys through it (paths are yielded as tuples)
+        key_policy: util.KeyPolicy, optional. If given, all keys are
+            checked against it on init, and new keys whenever set
+        shape_cache: shapes.ShapeCache, optional. If given, get_by_seq
+            and map_with_dict reuse the paths found for earlier
+            documents of the same shape
+
+    Change tracking:
+        After the first call to flatten or change_token, writes made
+        through __setitem__, __delitem__, map_leaves and map_with_dict
+        are logged (up to change_log_size of them) so later flattens
+        only redo the changed subtrees and changes_since can hand out
+        flat deltas. Writes made straight into self.data or its nested
+        dicts aren't seen.
 
     Alternate constructors:
         Args are only documented if their usage differs
@@ -27,20 +45,53 @@ class Trict(UserDict):
                     of flat_dict as well as their default usage
     """
 
-    def __init__(self, initialdata, key_sep='.'):
+    change_log_size = 1024
+
+    def __init__(self, initialdata, key_sep='.', path_table=None,
+                 key_policy=None, shape_cache=None):
         if key_sep is not None and type(key_sep) is not str:
             raise TypeError('key_sep must be str or None')
-        for k in iter_keys(initialdata):
-            if key_sep in k:
-                raise ValueError(f'key_sep found in key {k}')
+        if key_policy is not None:
+            key_policy.check_tree(initialdata, key_sep=key_sep)
+        else:
+            for k in iter_keys(initialdata):
+                if key_sep in k:
+                    raise ValueError(f'key_sep found in key {k}')
         self.key_sep = key_sep
+        self.path_table = path_table
+        self.shape_cache = shape_cache
+        self.key_policy = None
+        self._reset_tracking()
         super().__init__(initialdata)
+        # Set after init so the keys just checked aren't checked again
+        self.key_policy = key_policy
+
+    def __copy__(self):
+        inst = self.__class__.__new__(self.__class__)
+        inst.__dict__.update(self.__dict__)
+        inst.__dict__['data'] = self.__dict__['data'].copy()
+        inst._reset_tracking()
+        return inst
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # Change tracking isn't carried over, same as with copy
+        del state['_changes'], state['_flat_cache']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset_tracking()
 
     @classmethod
     def from_flat_dict(cls, flat_dict, key_sep='.', **kwargs):
+        path_table = kwargs.get('path_table')
         d = {}
         for k, v in flat_dict.items():
-            recursive_set(d, k.split(key_sep), v)
+            if path_table is not None:
+                recursive_set(d, path_table.split(k, key_sep), v)
+            else:
+                recursive_set(d, k.split(key_sep), v)
         return cls(d, key_sep=key_sep, **kwargs)
 
     def __getitem__(self, key):
@@ -53,43 +104,207 @@ class Trict(UserDict):
     def __setitem__(self, key, val):
         """See util.recursive_set"""
         key = self.key_to_seq(key)
+        if self.key_policy is not None:
+            self.key_policy.check_path(key)
+            if isinstance(val, dict):
+                self.key_policy.check_tree(val, depth=len(key))
+        if self._changes is None:
+            recursive_set(self.data, key, val)
+            return
+        stale = self._leaf_paths_at(key)
         recursive_set(self.data, key, val)
+        self._log_change(key, stale)
 
     def __delitem__(self, key):
         """See util.recursive_delete"""
         key = self.key_to_seq(key)
+        if self._changes is None:
+            recursive_delete(self.data, key)
+            return
+        stale = self._leaf_paths_at(key)
         recursive_delete(self.data, key)
+        self._log_change(key, stale)
 
     def __contains__(self, key):
-        key = self.key_to_seq(key)
-        return key in self.traverse(keys_only=True)
+        key = list(self.key_to_seq(key))
+        return key in traverse(self.data, keys_only=True)
 
     def __repr__(self):
         return f'{type(self).__name__}({super().__repr__()})'
 
+    def clone(self, depth=None, copy_leaves=False):
+        """Returns a new Trict with a copy of the data.
+
+        See util.clone_tree for args. Change tracking isn't carried over.
+        """
+        data = clone_tree(self.data, depth=depth, copy_leaves=copy_leaves)
+        inst = self.__class__.__new__(self.__class__)
+        inst.__dict__.update(self.__dict__)
+        inst.__dict__['data'] = data
+        inst._reset_tracking()
+        return inst
+
     def get(self, key, default=None):
         try:
             self.__getitem__(key)
         except KeyError:
             return default
 
+    def get_many(self, keys, default=None):
+        """See util.get_many
+
+        Keys can be strings or sequences, same as with __getitem__.
+        """
+        return get_many(
+            self.data,
+            [self.key_to_seq(k) for k in keys],
+            default=default
+        )
+
     def key_to_seq(self, key):
         if type(key) is str:
             key = key.split(self.key_sep)
         return key
 
     def flatten(self):
-        """See util.flatten_dict"""
+        """See util.flatten_dict
+
+        The result is cached, and subsequent calls only re-flatten
+        the subtrees changed since (see Change tracking above). A copy
+        of the cache is returned, see flat_view to skip the copy. Keys
+        that were rewritten may move to the end.
+        """
+        return dict(self._refresh_flat())
+
+    def flat_view(self):
+        """Same as flatten, but returns a read-only view of the cache.
+
+        Nothing is copied, but the view changes with later calls to
+        flatten and flat_view, so use flatten if the result is kept.
+        """
+        return MappingProxyType(self._refresh_flat())
+
+    def _refresh_flat(self):
+        sep = '.' if self.key_sep is None else self.key_sep
+        if self._changes is None:
+            self._changes = deque(maxlen=self.change_log_size)
+        if self._flat_cache is None:
+            self._flat_cache = flatten_dict(
+                self.data, sep=sep, path_table=self.path_table
+            )
+        elif self._flat_sep != sep or self._flat_token < self._log_floor:
+            flat = flatten_dict(self.data, sep=sep, path_table=self.path_table)
+            self._flat_cache.clear()
+            self._flat_cache.update(flat)
+        elif self._flat_token != self._version:
+            changed, removed = self.changes_since(self._flat_token)
+            for k in removed:
+                self._flat_cache.pop(k, None)
+            self._flat_cache.update(changed)
+        self._flat_sep = sep
+        self._flat_token = self._version
+        return self._flat_cache
+
+    @property
+    def change_token(self):
+        """Token for the current state, to be passed to changes_since.
+
+        Starts change tracking if it isn't on yet.
+        """
+        if self._changes is None:
+            self._changes = deque(maxlen=self.change_log_size)
+        return self._version
+
+    def changes_since(self, token):
+        """Flat delta between the state at token and the current state.
+
+        Args:
+            token: int, from change_token
+
+        returns:
+            2-tuple of
+                dict, {flat key: value} for leaves written since token
+                set, flat keys of leaves removed since token
+
+        Throws ValueError if the token is unknown, or so old that its
+        changes have already dropped out of the change log.
+        """
+        if self._changes is None or not self._log_floor <= token <= self._version:
+            raise ValueError(f'Changes since token {token} not available')
         sep = '.' if self.key_sep is None else self.key_sep
-        return flatten_dict(self.data, sep=sep)
+        # Versions in the log are consecutive, so the entries after
+        # token are the last (version - token) ones
+        recent = list(islice(reversed(self._changes), self._version - token))
+        recent.reverse()
+        paths = {}
+        stale = set()
+        for _, path, old in recent:
+            paths[path] = None
+            stale.update(old)
+        changed = {}
+        for path in paths:
+            try:
+                val = reduce(lambda x, y: x[y], path, self.data)
+            except (KeyError, TypeError):
+                continue
+            if isinstance(val, dict):
+                for k, v in leaves(val, prev=list(path)):
+                    changed[self._flat_key(k, sep)] = v
+            else:
+                changed[self._flat_key(path, sep)] = val
+        removed = {sep.join(k) for k in stale}
+        removed.difference_update(changed)
+        return changed, removed
+
+    def _reset_tracking(self):
+        self._changes = None
+        self._version = 0
+        self._log_floor = 0
+        self._flat_cache = None
+        self._flat_sep = None
+        self._flat_token = 0
+
+    def _leaf_paths_at(self, key):
+        try:
+            val = reduce(lambda x, y: x[y], key, self.data)
+        except (KeyError, TypeError):
+            return ()
+        if isinstance(val, dict):
+            return [tuple(k) for k, _ in leaves(val, prev=list(key))]
+        return [tuple(key)]
+
+    def _log_change(self, key, stale):
+        if len(self._changes) == self._changes.maxlen:
+            self._log_floor = self._changes[0][0]
+        self._version += 1
+        self._changes.append((self._version, tuple(key), stale))
 
-    def traverse(self, *args, **kwargs):
+    def _flat_key(self, path, sep):
+        if self.path_table is not None:
+            return self.path_table.join(path, sep, check_keys=True)
+        if any([sep in subkey for subkey in path]):
+            raise ValueError(f'Separator "{sep}" found in a subkey in path {list(path)}')
+        return sep.join(path)
+
+    def traverse(self, *args, start=None, **kwargs):
         """See util.traverse"""
-        yield from traverse(self.data, *args, **kwargs)
+        kwargs.setdefault('path_table', self.path_table)
+        if start is not None:
+            start = self.key_to_seq(start)
+        yield from traverse(self.data, *args, start=start, **kwargs)
 
-    def leaves(self):
+    def leaves(self, start=None, **kwargs):
         """See util.leaves"""
-        yield from leaves(self.data)
+        kwargs.setdefault('path_table', self.path_table)
+        if start is not None:
+            start = self.key_to_seq(start)
+        yield from leaves(self.data, start=start, **kwargs)
+
+    def iter_keys(self, start=None, **kwargs):
+        """See util.iter_keys"""
+        if start is not None:
+            start = self.key_to_seq(start)
+        yield from iter_keys(self.data, start=start, **kwargs)
 
     def get_by_seq(self, keys, strict=False):
         """
@@ -109,11 +324,16 @@ class Trict(UserDict):
             val from key if any key found or None if none found
             and strict == False.
         """
-        for k in keys:
-            try:
-                return self.__getitem__(k)
-            except KeyError:
-                continue
+        if self.shape_cache is not None:
+            val = self.shape_cache.resolve_seq(self.data, keys, self.key_sep)
+            if val is not _MISSING:
+                return val
+        else:
+            for k in keys:
+                try:
+                    return self.__getitem__(k)
+                except KeyError:
+                    continue
         if strict:
             raise KeyError(f'No key in {keys} found')
         return None
@@ -154,10 +374,27 @@ class Trict(UserDict):
                 key (from mapper_dict): value (from self) if any mapping matched
             }
         """
-        self.data = {
-            k: self.get_by_seq(
-                v, 
-                strict=strict
-            ) for k, v in mapper_dict.items()
-        }
+        if self.key_policy is not None:
+            for k in mapper_dict:
+                self.key_policy.check_path([k])
+        if self.shape_cache is not None:
+            data = self.shape_cache.resolve(self.data, mapper_dict, self.key_sep)
+            for k, v in data.items():
+                if v is _MISSING:
+                    if strict:
+                        raise KeyError(f'No key in {mapper_dict[k]} found')
+                    data[k] = None
+        else:
+            data = {
+                k: self.get_by_seq(
+                    v, 
+                    strict=strict
+                ) for k, v in mapper_dict.items()
+            }
+        if self._changes is None:
+            self.data = data
+            return self
+        stale = self._leaf_paths_at(())
+        self.data = data
+        self._log_change((), stale)
         return self
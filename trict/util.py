@@ -1,5 +1,205 @@
+import re
 import sys
 import copy 
+from collections import OrderedDict
+from itertools import islice
+
+_MISSING = object()
+_ATOMIC_TYPES = (str, int, float, bool, type(None), bytes)
+
+
+class PathTable:
+    """Bounded table of canonical key paths and joined keys.
+
+    Flattening or walking many documents with the same shape
+    creates the same key paths over and over. Passing a PathTable
+    to the helpers makes them hand out one shared tuple per path
+    and one shared string per joined key, so results kept around
+    don't each hold their own copies. Least recently used entries
+    are evicted once a table holds more than maxsize of them.
+
+    Args:
+        maxsize: int, max entries kept per table (paths, split keys
+            and joined keys per separator are counted separately)
+
+    Example usage:
+        >>> table = PathTable()
+        >>> a = table.path(['user', 'information'])
+        >>> b = table.path(('user', 'information'))
+        >>> a is b
+        True
+    """
+
+    def __init__(self, maxsize=65536):
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+        self.maxsize = maxsize
+        self._paths = OrderedDict()
+        self._joined = {}
+        self._split = OrderedDict()
+
+    def __len__(self):
+        return (len(self._paths) + len(self._split)
+                + sum(len(t) for t in self._joined.values()))
+
+    def clear(self):
+        self._paths.clear()
+        self._joined.clear()
+        self._split.clear()
+
+    def _lookup(self, table, key, factory):
+        try:
+            val = table[key]
+        except KeyError:
+            val = factory()
+            table[key] = val
+            if len(table) > self.maxsize:
+                table.popitem(last=False)
+            return val
+        table.move_to_end(key)
+        return val
+
+    def path(self, path):
+        """Returns the canonical tuple for a key path.
+
+        Only paths made of str keys are interned, others are returned
+        as new tuples (keys like 1 and True are equal, but aren't the
+        same key).
+        """
+        path = tuple(path)
+        for k in path:
+            if type(k) is not str:
+                return path
+        return self._intern(path)
+
+    def _intern(self, path):
+        # For tuples of str keys only
+        paths = self._paths
+        canonical = paths.get(path)
+        if canonical is None:
+            paths[path] = path
+            if len(paths) > self.maxsize:
+                paths.popitem(last=False)
+            return path
+        paths.move_to_end(path)
+        return canonical
+
+    def join(self, path, sep='.', check_keys=False):
+        """Returns the canonical sep-joined string for a key path.
+
+        If check_keys is True, throws if a subkey contains sep. The
+        check is only done when the key isn't already in the table.
+        """
+        return self._join_canonical(self.path(path), sep, check_keys)
+
+    def _join_canonical(self, path, sep, check_keys):
+        # For paths that already came from self.path, skips looking them up again
+        joined = self._joined.get(sep)
+        if joined is None:
+            joined = self._joined[sep] = OrderedDict()
+        key = joined.get(path)
+        if key is not None:
+            joined.move_to_end(path)
+            return key
+        if check_keys and any([sep in subkey for subkey in path]):
+            raise ValueError(
+                f'Separator "{sep}" found in a subkey in path {list(path)}'
+            )
+        key = joined[path] = sep.join(path)
+        if len(joined) > self.maxsize:
+            joined.popitem(last=False)
+        return key
+
+    def split(self, key, sep='.'):
+        """Returns the canonical tuple for a sep-joined string key."""
+        return self._lookup(
+            self._split,
+            (key, sep),
+            lambda: self._intern(tuple(key.split(sep)))
+        )
+
+
+class KeyPolicy:
+    """Rules for keys, checked when they're added to a Trict.
+
+    Keys that have passed are remembered (up to cache_size of them),
+    so checking a key that's already been seen is a set lookup.
+
+    Args:
+        pattern: str or compiled regex, every key has to fully match it
+        allowed_chars: str or set, characters keys can be made of
+        max_depth: int, max number of keys in a path
+        max_key_length: int, max length of a single key
+        cache_size: int, max number of approved keys remembered
+
+    Keys that aren't strings fail any of the string rules.
+
+    Example usage:
+        >>> policy = KeyPolicy(pattern=r'[a-z_]+', max_depth=3)
+        >>> policy.check_path(['user', 'information'])
+        >>> policy.check_path(['user', 'Information'])
+        ValueError: Key 'Information' doesn't match pattern '[a-z_]+'
+    """
+
+    def __init__(self, pattern=None, allowed_chars=None, max_depth=None,
+                 max_key_length=None, cache_size=65536):
+        self.pattern = re.compile(pattern) if isinstance(pattern, str) else pattern
+        self.allowed_chars = None if allowed_chars is None else frozenset(allowed_chars)
+        self.max_depth = max_depth
+        self.max_key_length = max_key_length
+        self.cache_size = cache_size
+        self._approved = set()
+        self._check_strings = (pattern is not None or allowed_chars is not None
+                               or max_key_length is not None)
+
+    def check_key(self, key):
+        """Throws ValueError if key breaks the policy."""
+        if key in self._approved or not self._check_strings:
+            return
+        if type(key) is not str:
+            raise ValueError(f'Key {key!r} is not a string')
+        if self.pattern is not None and self.pattern.fullmatch(key) is None:
+            raise ValueError(
+                f"Key '{key}' doesn't match pattern '{self.pattern.pattern}'"
+            )
+        if self.allowed_chars is not None and not self.allowed_chars.issuperset(key):
+            raise ValueError(f"Key '{key}' has characters that aren't allowed")
+        if self.max_key_length is not None and len(key) > self.max_key_length:
+            raise ValueError(
+                f"Key '{key}' is longer than {self.max_key_length} characters"
+            )
+        if len(self._approved) >= self.cache_size:
+            self._approved.clear()
+        self._approved.add(key)
+
+    def check_path(self, path):
+        """Throws ValueError if any key in path or its length breaks the policy."""
+        if self.max_depth is not None and len(path) > self.max_depth:
+            raise ValueError(f'Path {list(path)} is deeper than {self.max_depth}')
+        for k in path:
+            self.check_key(k)
+
+    def check_tree(self, d, depth=0, key_sep=None):
+        """Throws ValueError if any key in d breaks the policy.
+
+        Args:
+            d: dict, checked all the way down
+            depth: int, depth d itself is at
+            key_sep: str, if given, also throws if a key contains it
+        """
+        stack = [(d, depth + 1)]
+        while stack:
+            node, level = stack.pop()
+            if self.max_depth is not None and level > self.max_depth and node:
+                raise ValueError(
+                    f'Key {next(iter(node))!r} is deeper than {self.max_depth}'
+                )
+            for k, v in node.items():
+                if key_sep is not None and key_sep in k:
+                    raise ValueError(f'key_sep found in key {k}')
+                self.check_key(k)
+                if isinstance(v, dict):
+                    stack.append((v, level + 1))
 
 def recursive_set(d, attr_list, val):
     """Recursively sets dictionary values. Will create non-existant keys
@@ -22,15 +222,18 @@ def recursive_set(d, attr_list, val):
             }
         }
     """
-    if len(attr_list) == 1:
-        d[attr_list[0]] = val
-    else:
+    for i, k in enumerate(attr_list[:-1]):
         try:
-            root = d[attr_list[0]]
-            recursive_set(root, attr_list[1:], val)
+            d = d[k]
         except KeyError:
-            d[attr_list[0]] = {}
-            recursive_set(d[attr_list[0]], attr_list[1:], val)
+            # Build the missing branch first and attach it in one go,
+            # so readers never see half-built intermediate dicts
+            branch = val
+            for sub in reversed(attr_list[i + 1:]):
+                branch = {sub: branch}
+            d[k] = branch
+            return
+    d[attr_list[-1]] = val
 
 def recursive_delete(d, attr_list):
     if len(attr_list) == 1:
@@ -39,7 +242,108 @@ def recursive_delete(d, attr_list):
         root = d[attr_list[0]]
         recursive_delete(root, attr_list[1:])
 
-def flatten_dict(d, sep='.', check_keys=True):
+def _child(node, k):
+    if type(node) is dict:
+        return node.get(k, _MISSING)
+    try:
+        return node[k]
+    except (KeyError, IndexError, TypeError):
+        return _MISSING
+
+def get_many(d, paths, default=None):
+    """Gets values for many key paths in one pass.
+
+    The parent of each path is looked up once per distinct prefix
+    and remembered, so paths sharing a prefix (say twenty fields
+    under the same dict) only walk it once. Missing paths get
+    default instead of raising.
+
+    params:
+        d: dictionary to get values from
+        paths: list of key paths (each a list of nested keys)
+        default: value returned for paths that are not found
+
+    returns:
+        list of values in the same order as paths
+
+    Example usage:
+        >>> d = {'user': {'information': {'attribute': 'infonugget'}}}
+        >>> get_many(d, [
+                ['user', 'information', 'attribute'],
+                ['user', 'information', 'notanattribute'],
+            ])
+        ['infonugget', None]
+    """
+    ret = []
+    parents = {}
+    for path in paths:
+        if not path:
+            ret.append(d)
+            continue
+        prefix = tuple(path[:-1])
+        parent = parents.get(prefix)
+        if parent is None:
+            parent = d
+            for k in prefix:
+                parent = _child(parent, k)
+                if parent is _MISSING:
+                    break
+            parents[prefix] = parent
+        val = _MISSING if parent is _MISSING else _child(parent, path[-1])
+        ret.append(default if val is _MISSING else val)
+    return ret
+
+def clone_tree(d, depth=None, copy_leaves=False):
+    """Copies the nested dicts of a dictionary.
+
+    Faster than copy.deepcopy for plain nested dicts, and doesn't
+    recurse so it works on any depth. Only values that are exactly
+    dicts are copied as nested dicts, dict subclasses (defaultdict,
+    OrderedDict etc.) are treated like any other leaf. The returned
+    copy is a plain dict. Dicts that contain themselves aren't
+    supported.
+
+    Args:
+        d:
+            dict, dictionary to copy
+        depth:
+            int, number of dict levels to copy, at least 1. Dicts below
+            that are shared with d. Default None copies all levels.
+        copy_leaves:
+            bool, if True non-dict values are deepcopied as well
+            (with one memo for the whole call). Default False shares
+            them with d.
+
+    Example usage:
+        >>> d = {'user': {'information': {'attribute': ['infonugget']}}}
+        >>> c = clone_tree(d)
+        >>> c == d, c['user'] is d['user']
+        (True, False)
+        >>> c['user']['information']['attribute'] is d['user']['information']['attribute']
+        True
+        >>> clone_tree(d, depth=1)['user'] is d['user']
+        True
+    """
+    if depth is not None and depth < 1:
+        raise ValueError('depth must be at least 1')
+    memo = {} if copy_leaves else None
+    ret = {}
+    stack = [(d, ret, 1)]
+    while stack:
+        src, dst, level = stack.pop()
+        descend = depth is None or level < depth
+        for k, v in src.items():
+            if type(v) is dict:
+                if descend:
+                    v_copy = {}
+                    stack.append((v, v_copy, level + 1))
+                    v = v_copy
+            elif memo is not None and type(v) not in _ATOMIC_TYPES:
+                v = copy.deepcopy(v, memo)
+            dst[k] = v
+    return ret
+
+def flatten_dict(d, sep='.', check_keys=True, path_table=None):
     """Flatten a dictionary.
 
     Args:
@@ -50,6 +354,9 @@ def flatten_dict(d, sep='.', check_keys=True):
         check_keys:
             bool, if True will throw if a key in
             d already contains sep
+        path_table:
+            PathTable, if given, joined keys are taken from
+            (and added to) it instead of built per leaf
 
     Example usage:
         >>> d = {
@@ -69,15 +376,155 @@ def flatten_dict(d, sep='.', check_keys=True):
         }
     """
     ret_d = {}
+    if path_table is not None:
+        join = path_table._join_canonical
+        for k, v in leaves(d, path_table=path_table):
+            ret_d[join(k, sep, check_keys)] = v
+        return ret_d
     for k, v in leaves(d):
         if check_keys and any([sep in subkey for subkey in k]):
             raise ValueError(f'Separator "{sep}" found in a subkey in path {k}')
         ret_d[sep.join(k)] = v 
     return ret_d
 
-def iter_keys(d):
+def _walk(d, prev, path_table, start, max_depth, prune, paths=True):
+    """Iterative pre-order walk shared by traverse, leaves and iter_keys.
+
+    Yields 4-tuples of (key path, key, value, value is a dict). Uses
+    an explicit stack so stopping early doesn't leave a generator
+    suspended per level, and pruned or too deep subtrees are never
+    entered. If paths is False (and there's no prune), key paths
+    aren't built and None is yielded in their place.
+    """
+    if start:
+        for k in start:
+            try:
+                d = d[k]
+            except (KeyError, IndexError, TypeError):
+                raise KeyError(f'Path not found: {list(start)}')
+        prev = list(prev) + list(start)
+    if not isinstance(d, dict) or (max_depth is not None and max_depth < 1):
+        return
+    paths = paths or prune is not None
+    if paths and path_table is not None:
+        prev = path_table.path(prev)
+    elif paths:
+        prev = list(prev)
+    stack = [(iter(d.items()), prev)]
+    while stack:
+        items, prefix = stack[-1]
+        item = next(items, None)
+        if item is None:
+            stack.pop()
+            continue
+        k, v = item
+        if not paths:
+            path = None
+        elif path_table is None:
+            path = prefix + [k]
+        else:
+            path = path_table.path(prefix + (k,))
+        if prune is not None and prune(path, v):
+            continue
+        is_dict = isinstance(v, dict)
+        yield path, k, v, is_dict
+        if is_dict and (max_depth is None or len(stack) < max_depth):
+            stack.append((iter(v.items()), path))
+
+def _iter_keys_fast(d):
+    # Plain full walks skip _walk's bookkeeping. The iterator on top
+    # of the stack is resumed after each nested dict is done.
+    stack = [iter(d.items())]
+    while stack:
+        for k, v in stack[-1]:
+            yield k
+            if isinstance(v, dict):
+                stack.append(iter(v.items()))
+                break
+        else:
+            stack.pop()
+
+def _leaves_fast(d, prev):
+    stack = [iter(d.items())]
+    prefixes = [list(prev)]
+    while stack:
+        prefix = prefixes[-1]
+        for k, v in stack[-1]:
+            path = prefix + [k]
+            if isinstance(v, dict):
+                stack.append(iter(v.items()))
+                prefixes.append(path)
+                break
+            yield path, v
+        else:
+            stack.pop()
+            prefixes.pop()
+
+def _leaves_interned(d, prev, path_table):
+    # Same as _leaves_fast, but paths made of str keys are interned.
+    # prefixes holds (prefix, whether it's made of str keys only) so
+    # only the new key's type needs checking per path.
+    intern = path_table._intern
+    prev = path_table.path(prev)
+    stack = [iter(d.items())]
+    prefixes = [(prev, all(type(k) is str for k in prev))]
+    while stack:
+        prefix, interned = prefixes[-1]
+        for k, v in stack[-1]:
+            path = prefix + (k,)
+            if interned and type(k) is str:
+                path = intern(path)
+                if isinstance(v, dict):
+                    stack.append(iter(v.items()))
+                    prefixes.append((path, True))
+                    break
+            elif isinstance(v, dict):
+                stack.append(iter(v.items()))
+                prefixes.append((path, False))
+                break
+            yield path, v
+        else:
+            stack.pop()
+            prefixes.pop()
+
+def _traverse_fast(d, keys_only, prev, path_table):
+    intern = None if path_table is None else path_table._intern
+    stack = [iter(d.items())]
+    if intern is None:
+        prefixes = [(list(prev), False)]
+    else:
+        prev = path_table.path(prev)
+        prefixes = [(prev, all(type(k) is str for k in prev))]
+    while stack:
+        prefix, interned = prefixes[-1]
+        for k, v in stack[-1]:
+            if intern is None:
+                path = prefix + [k]
+                is_str = False
+            else:
+                path = prefix + (k,)
+                is_str = interned and type(k) is str
+                if is_str:
+                    path = intern(path)
+            yield path if keys_only else (path, v)
+            if isinstance(v, dict):
+                stack.append(iter(v.items()))
+                prefixes.append((path, is_str))
+                break
+        else:
+            stack.pop()
+            prefixes.pop()
+
+def iter_keys(d, start=None, max_depth=None, prune=None, limit=None):
     """Recursively iterate through all keys at any level.
 
+    Args:
+        start: list, key path to start from (default is the root)
+        max_depth: int, levels below start to go through
+        prune: callable(path, value), nodes it returns True for are
+            skipped along with everything below them
+        limit: int, max number of keys to yield
+
     Example usage:
         >>> d = {
                 'user': {
@@ -90,17 +537,29 @@ def iter_keys(d):
             }
         >>> [k for k in iter_keys(d)]
         ['user', 'information', 'attribute', 'another_attribute', 'moreinformation']
+        >>> [k for k in iter_keys(d, max_depth=2)]
+        ['user', 'information', 'moreinformation']
     """
-    for k, v in d.items():
-        yield(k)
-        if isinstance(v, dict):
-            yield from iter_keys(v)
+    if start is None and max_depth is None and prune is None and limit is None:
+        return _iter_keys_fast(d)
+    nodes = _walk(d, [], None, start, max_depth, prune, paths=False)
+    keys = (k for _, k, _, _ in nodes)
+    if limit is not None:
+        keys = islice(keys, limit)
+    return keys
 
-def leaves(d, prev=[]):
+def leaves(d, prev=[], path_table=None, start=None, max_depth=None,
+           prune=None, limit=None):
     """Returns leaves of dictionary and their keys.
 
     Yields 2-tuples of (key path as list, value).
 
+    If path_table (a PathTable) is given, key paths are
+    yielded as canonical tuples from it instead of lists.
+
+    start, max_depth, prune and limit work as in iter_keys. Leaves
+    below max_depth aren't yielded.
+
     Example usage:
         >>> d = {
                 'user': {
@@ -118,14 +577,18 @@ def leaves(d, prev=[]):
             (['user', 'moreinformation'], 'extranugget')
         ]
     """
-    for k, v in d.items():
-        new_k = prev + [k]
-        if isinstance(v, dict):
-            yield from leaves(v, prev=new_k)
-        else:
-            yield new_k, v
+    if start is None and max_depth is None and prune is None and limit is None:
+        if path_table is not None:
+            return _leaves_interned(d, prev, path_table)
+        return _leaves_fast(d, prev)
+    nodes = _walk(d, prev, path_table, start, max_depth, prune)
+    found = ((path, v) for path, _, v, is_dict in nodes if not is_dict)
+    if limit is not None:
+        found = islice(found, limit)
+    return found
 
-def traverse(d, keys_only=False, prev=[]):
+def traverse(d, keys_only=False, prev=[], path_table=None, start=None,
+             max_depth=None, prune=None, limit=None):
     """Traverses through dictionary.
 
     Yields 2-tuples of (key path as list, value)
@@ -133,6 +596,11 @@ def traverse(d, keys_only=False, prev=[]):
 
     If keys_only=True, only yields keys.
 
+    If path_table (a PathTable) is given, key paths are
+    yielded as canonical tuples from it instead of lists.
+
+    start, max_depth, prune and limit work as in iter_keys.
+
     Example usage:
         >>> d = {
                     'user': {
@@ -166,13 +634,15 @@ def traverse(d, keys_only=False, prev=[]):
                 ['user', 'moreinformation'], 'extranugget'
             )
         ]
+        >>> [k for k in traverse(d, keys_only=True, start=['user'], max_depth=1)]
+        [['user', 'information'], ['user', 'moreinformation']]
 
     """
-    for k, v in d.items():
-        new_k = prev + [k]
-        if keys_only:
-            yield new_k
-        else:
-            yield new_k, v
-        if isinstance(v, dict):
-            yield from traverse(v, keys_only=keys_only, prev=new_k)
+    if start is None and max_depth is None and prune is None and limit is None:
+        return _traverse_fast(d, keys_only, prev, path_table)
+    nodes = _walk(d, prev, path_table, start, max_depth, prune)
+    if limit is not None:
+        nodes = islice(nodes, limit)
+    if keys_only:
+        return (path for path, _, _, _ in nodes)
+    return ((path, v) for path, _, v, _ in nodes)